@@ -1,239 +1,714 @@
-from flask import Flask, request, jsonify
 import os
-import json
-import datetime
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from flask_cors import CORS  # Added for CORS support
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+import csv
+import fcntl
+import io
+import math
+import mmap
+import hashlib
+import threading
+import time
+import concurrent.futures
+import multiprocessing
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Union
+import msgspec
+import orjson
+import uvicorn
+from fastapi import FastAPI, BackgroundTasks, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])  # Enable CORS for all routes
 
 # Create directories if they don't exist
 os.makedirs('tradingview_data', exist_ok=True)
 os.makedirs('optimization_results', exist_ok=True)
 
-@app.route('/')
-def home():
+class SharedRotatingFileHandler(WatchedFileHandler):
+    """Append to a log file shared by several processes, rotating it once it reaches max_bytes.
+
+    Rotation is serialized across processes by a lock on a sidecar file; processes that didn't
+    rotate notice the replaced file through WatchedFileHandler's inode check and reopen it.
+    """
+    def __init__(self, filename, max_bytes, backup_count, delay=False):
+        super().__init__(filename, delay=delay)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock_file = self.baseFilename + '.lock'
+
+    def emit(self, record):
+        try:
+            self.reopenIfNeeded()
+            if self.stream is not None and os.fstat(self.stream.fileno()).st_size >= self.max_bytes:
+                self.rotate_shared()
+        except Exception:
+            self.handleError(record)
+            return
+        super().emit(record)
+
+    def rotate_shared(self):
+        with open(self.lock_file, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have rotated the file while this one waited for the lock
+            try:
+                if os.stat(self.baseFilename).st_size < self.max_bytes:
+                    return
+            except FileNotFoundError:
+                return
+            for i in range(self.backup_count - 1, 0, -1):
+                backup = f"{self.baseFilename}.{i}"
+                if os.path.exists(backup):
+                    os.replace(backup, f"{self.baseFilename}.{i + 1}")
+            if self.backup_count > 0:
+                os.replace(self.baseFilename, f"{self.baseFilename}.1")
+            else:
+                os.remove(self.baseFilename)
+        # reopenIfNeeded() then switches to a new file when super().emit() runs it again
+
+# Errors are logged through a queue; a listener thread owns the error log file handle, which is
+# opened on the first error. Every server worker and plotting process appends to the same file,
+# which is rotated once it reaches ERROR_LOG_MAX_BYTES.
+ERROR_LOG_FILE = 'tradingview_data/error_log.txt'
+ERROR_LOG_MAX_BYTES = 5_000_000
+ERROR_LOG_BACKUP_COUNT = 3
+logger = logging.getLogger('webhook_receiver')
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+_error_log_handler = SharedRotatingFileHandler(ERROR_LOG_FILE, ERROR_LOG_MAX_BYTES, ERROR_LOG_BACKUP_COUNT, delay=True)
+_error_log_handler.setFormatter(logging.Formatter('%(asctime)s: %(message)s'))
+_log_listener = QueueListener(_log_queue, _error_log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# Metrics and parameters recorded in the optimization history, and the CSV column order
+METRIC_KEYS = ('total_return_pct', 'win_rate', 'profit_factor', 'max_drawdown_pct', 'total_trades')
+PARAM_KEYS = ('take_profit', 'stop_loss', 'trailing_stop', 'trailing_activation')
+FIELDS = ('timestamp',) + METRIC_KEYS + PARAM_KEYS
+
+# Webhook payload schema, decoded and validated straight from the request body. Numbers may also
+# arrive as strings or wrapped as {"value": x}, depending on how the TradingView alert is written.
+class WrappedValue(msgspec.Struct):
+    value: Union[float, str, None] = 0
+
+NumberField = Union[float, str, WrappedValue, None]
+Metrics = msgspec.defstruct('Metrics', [(key, NumberField, None) for key in METRIC_KEYS])
+Parameters = msgspec.defstruct('Parameters', [(key, NumberField, None) for key in PARAM_KEYS])
+
+class WebhookPayload(msgspec.Struct):
+    strategy_name: str = 'unknown_strategy'
+    metrics: Optional[Metrics] = None
+    parameters: Optional[Parameters] = None
+
+_webhook_decoder = msgspec.json.Decoder(WebhookPayload)
+
+# Metrics reported alongside suggested parameters
+SUMMARY_METRIC_KEYS = ('total_return_pct', 'win_rate', 'profit_factor', 'max_drawdown_pct')
+
+# Running state per strategy: row count plus best-return and best-risk-adjusted rows, covering
+# the first history_size bytes of the history CSV; mirrored in a sidecar file
+ANALYSED_KEYS = SUMMARY_METRIC_KEYS + PARAM_KEYS
+_strategy_state = {}
+
+def _init_plot_worker():
+    """Log straight to the error log file in the plotting process instead of through a queue listener"""
+    # The plotting process imports this module afresh, which started a listener it doesn't need
+    _log_listener.stop()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.addHandler(_error_log_handler)
+
+# Plots are rendered in a separate process, at most once per cooldown period per strategy,
+# and only after PLOT_EVERY_ROWS new rows or when the take profit/stop loss extents change.
+# The executor is created at startup so every server worker process gets its own. Its process is
+# started by a forkserver rather than forked from the multi-threaded server worker, whose locks
+# (stdout, the queues) could be inherited mid-use and deadlock it.
+PLOT_COOLDOWN_SECONDS = 60
+PLOT_EVERY_ROWS = 10
+PLOT_EXTENT_KEYS = ['take_profit', 'stop_loss']
+_plot_executor = None
+_last_plot_ts = {}
+# (row count, extents) of the history at the last render, per strategy
+_viz_state = {}
+
+# Figures, Agg canvases and colorbar axes reused between renders in the plotting process.
+# Figures are not thread-safe, so renders hold the lock. pandas, numpy and matplotlib are
+# imported inside the plotting functions, so only the plotting process loads them.
+_PLOT_FIGS = {}
+_plot_lock = threading.Lock()
+
+# Formatted timestamps for the current second: (epoch second, file timestamp, ISO timestamp)
+_TS_CACHE = (None, '', '')
+
+# Received payloads are queued and appended to one JSONL file per strategy by a single writer thread,
+# which groups up to PAYLOAD_BATCH_SIZE lines or PAYLOAD_BATCH_SECONDS worth into one write per file
+MAX_OPEN_PAYLOAD_LOGS = 128
+PAYLOAD_QUEUE_SIZE = 10_000
+PAYLOAD_BATCH_SIZE = 256
+PAYLOAD_BATCH_SECONDS = 0.05
+_payload_logs = {}
+_payload_queue = queue.Queue(maxsize=PAYLOAD_QUEUE_SIZE)
+_payload_writer = None
+
+# Hashes of recently accepted request bodies, so retried webhooks are acknowledged without redoing any work
+MAX_RECENT_PAYLOADS = 4096
+_recent_payloads = OrderedDict()
+
+# Background tasks run in a thread pool; serialize history and suggestion updates
+_processing_lock = threading.Lock()
+
+def ts_pair():
+    """Return (file timestamp, ISO timestamp) for the current second, formatting them once per second"""
+    global _TS_CACHE
+    now = int(time.time())
+    cached = _TS_CACHE
+    if cached[0] != now:
+        # Format the components directly rather than through the locale-aware strftime
+        t = time.localtime(now)
+        date = f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}"
+        cached = _TS_CACHE = (now, f"{date}_{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}",
+                              f"{date[:4]}-{date[4:6]}-{date[6:]} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}")
+    return cached[1], cached[2]
+
+# File paths per strategy, cached since the same strategies post repeatedly
+@lru_cache(maxsize=256)
+def payload_log_path(strategy_name):
+    return f"tradingview_data/{strategy_name}.jsonl"
+
+@lru_cache(maxsize=256)
+def history_path(strategy_name):
+    return f"tradingview_data/{strategy_name}_optimization_history.csv"
+
+@lru_cache(maxsize=256)
+def strategy_state_path(strategy_name):
+    return f"tradingview_data/{strategy_name}_state.json"
+
+@lru_cache(maxsize=256)
+def suggestions_path(strategy_name):
+    return f"optimization_results/{strategy_name}_suggestions.json"
+
+@lru_cache(maxsize=256)
+def suggestions_hash_path(strategy_name):
+    return f"optimization_results/{strategy_name}.hash"
+
+@lru_cache(maxsize=256)
+def sample_pine_path(strategy_name):
+    return f"optimization_results/{strategy_name}_sample.pine"
+
+@lru_cache(maxsize=256)
+def pine_path(strategy_name):
+    return f"optimization_results/{strategy_name}_suggestions.pine"
+
+# Strategies whose per-suggestion Pine Scripts from before the combined file were already removed
+_legacy_pine_removed = set()
+
+def legacy_pine_path(strategy_name, suggestion_type):
+    """Path of a per-suggestion Pine Script written before suggestions were combined into one file"""
+    return f"optimization_results/{strategy_name}_{suggestion_type}_suggested.pine"
+
+def new_plot_executor():
+    return concurrent.futures.ProcessPoolExecutor(max_workers=1, initializer=_init_plot_worker,
+                                                  mp_context=multiprocessing.get_context('forkserver'))
+
+@app.on_event("startup")
+def start_worker_state():
+    """Start this server worker's payload writer and plotting process with an empty strategy state cache"""
+    global _plot_executor, _payload_writer
+    _strategy_state.clear()
+    _payload_writer = threading.Thread(target=drain_payload_queue, name='payload-writer', daemon=True)
+    _payload_writer.start()
+    _plot_executor = new_plot_executor()
+
+@app.on_event("shutdown")
+def stop_worker_state():
+    global _plot_executor, _payload_writer
+    # Let the writer finish the queued payloads; server worker processes exit without running atexit handlers
+    if _payload_writer is not None:
+        _payload_queue.put(None)
+        _payload_writer.join()
+        _payload_writer = None
+    close_payload_logs()
+    if _plot_executor is not None:
+        _plot_executor.shutdown()
+        _plot_executor = None
+
+@app.get('/', response_class=PlainTextResponse)
+async def home():
     return "TradingView Webhook Receiver is running!"
 
-@app.route('/webhook', methods=['POST'])
-def webhook():
+@app.post('/webhook')
+async def webhook(request: Request, background_tasks: BackgroundTasks):
     try:
-        # Get webhook data
-        data = request.json
+        # Decode and validate webhook data from the raw body, whatever Content-Type the sender set
+        body = await request.body()
+        
+        # Acknowledge retries of a recently accepted payload without processing them again
+        payload_hash = hashlib.blake2b(body, digest_size=16).digest()
+        if payload_hash in _recent_payloads:
+            _recent_payloads.move_to_end(payload_hash)
+            print("Webhook received duplicate payload, skipping")
+            return {"status": "duplicate", "message": "Duplicate webhook already processed"}
+        
+        try:
+            data = _webhook_decoder.decode(body) if body else None
+        except msgspec.ValidationError as e:
+            print(f"Webhook received invalid payload: {str(e)}")
+            return ORJSONResponse({"status": "error", "message": f"Invalid webhook payload: {str(e)}"}, status_code=400)
+        except msgspec.DecodeError as e:
+            print(f"Webhook received invalid JSON: {str(e)}")
+            return ORJSONResponse({"status": "error", "message": f"Invalid JSON payload: {str(e)}"}, status_code=400)
         
         # Print received data for debugging
         print(f"Webhook received with data: {data}")
         
-        # Validate required fields
-        if not data:
-            return jsonify({"status": "error", "message": "No data received"}), 400
+        # Validate required fields; the payload is logged compacted onto one line,
+        # since the sender's formatting may span lines
+        line = msgspec.json.format(body, indent=-1) if body else b''
+        if data is None or line == b'{}':
+            return ORJSONResponse({"status": "error", "message": "No data received"}, status_code=400)
             
-        # Extract strategy name if available, otherwise use a default
-        strategy_name = data.get('strategy_name', 'unknown_strategy')
+        # Strategy name defaults to unknown_strategy; metrics and parameters are None if not sent
+        strategy_name = data.strategy_name
+        metrics = data.metrics
+        parameters = data.parameters
         
-        # Extract metrics and parameters if available
-        metrics = data.get('metrics', {})
-        parameters = data.get('parameters', {})
+        # Create timestamps once, shared by the response, the history row and the generated files
+        timestamp, received_at = ts_pair()
         
-        # Create timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Queue the payload for the writer thread
+        filename = payload_log_path(strategy_name)
+        try:
+            _payload_queue.put_nowait((strategy_name, line + b'\n'))
+        except queue.Full:
+            print(f"Payload queue full, rejecting webhook for {strategy_name}")
+            return ORJSONResponse({"status": "error", "message": "Server busy, try again later"}, status_code=503)
         
-        # Save raw data to JSON file
-        filename = f"tradingview_data/{strategy_name}_{timestamp}.json"
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=4)
+        # Remember the accepted payload; the handler doesn't await between the lookup and here
+        _recent_payloads[payload_hash] = None
+        if len(_recent_payloads) > MAX_RECENT_PAYLOADS:
+            _recent_payloads.popitem(last=False)
         
-        # Update optimization history if we have metrics and parameters
-        if metrics and parameters:
-            update_optimization_history(strategy_name, metrics, parameters)
-            
-            # Generate optimization suggestions
-            generate_optimization_suggestions(strategy_name)
-        else:
-            # Generate a sample Pine Script for testing if no metrics/parameters
-            generate_sample_pine_script(strategy_name)
+        # History, suggestions and plots are processed after the response is sent
+        background_tasks.add_task(process_webhook_data, strategy_name, metrics, parameters, received_at)
         
-        return jsonify({
+        return {
             "status": "success", 
             "message": "Webhook received and processed",
             "timestamp": timestamp,
             "strategy": strategy_name,
             "data_saved": filename
-        }), 200
+        }
     
     except Exception as e:
         print(f"Error processing webhook: {str(e)}")
         # Log the error
-        with open('tradingview_data/error_log.txt', 'a') as f:
-            f.write(f"{datetime.datetime.now()}: {str(e)}\n")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        logger.exception(str(e))
+        return ORJSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 # Simple test endpoint that accepts both GET and POST
-@app.route('/test', methods=['GET', 'POST'])
-def test():
+@app.api_route('/test', methods=['GET', 'POST'], response_class=PlainTextResponse)
+async def test(request: Request):
     print("Test endpoint hit!")
     if request.method == 'POST':
         try:
-            data = request.json
+            data = orjson.loads(await request.body())
             print(f"Test endpoint received POST data: {data}")
-        except:
+        except Exception:
             print("Test endpoint received POST but no JSON data")
-    return "Test endpoint successful", 200
+    return "Test endpoint successful"
+
+def get_payload_log(strategy_name):
+    """Return the open payload log for a strategy, opening it on first use (writer thread only)"""
+    f = _payload_logs.get(strategy_name)
+    if f is None:
+        # Close the least recently opened log rather than holding an unbounded number of files
+        if len(_payload_logs) >= MAX_OPEN_PAYLOAD_LOGS:
+            _payload_logs.pop(next(iter(_payload_logs))).close()
+        f = _payload_logs[strategy_name] = open(payload_log_path(strategy_name), 'ab', buffering=0)
+    return f
+
+def close_payload_logs():
+    """Close all open payload logs"""
+    while _payload_logs:
+        _payload_logs.popitem()[1].close()
+
+atexit.register(close_payload_logs)
+
+def drain_payload_queue():
+    """Write queued payloads in batches until a None sentinel is queued (runs in the writer thread)"""
+    while True:
+        item = _payload_queue.get()
+        if item is None:
+            return
+        batch = [item]
+        deadline = time.monotonic() + PAYLOAD_BATCH_SECONDS
+        while len(batch) < PAYLOAD_BATCH_SIZE:
+            try:
+                item = _payload_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                write_payload_batch(batch)
+                return
+            batch.append(item)
+        write_payload_batch(batch)
+
+def write_payload_batch(batch):
+    """Append a batch of (strategy, line) payloads with one write per strategy log"""
+    lines = {}
+    for strategy_name, line in batch:
+        lines.setdefault(strategy_name, []).append(line)
+    for strategy_name, strategy_lines in lines.items():
+        try:
+            get_payload_log(strategy_name).write(b''.join(strategy_lines))
+        except Exception as e:
+            print(f"Error saving webhook payload: {str(e)}")
+            logger.exception(f"Error saving webhook payload: {str(e)}")
 
-def update_optimization_history(strategy_name, metrics, parameters):
+def process_webhook_data(strategy_name, metrics, parameters, received_at):
+    """Update history and generate suggestions for a received webhook (runs as a background task)"""
+    try:
+        with _processing_lock:
+            # Update optimization history if we have metrics and parameters
+            if has_values(metrics) and has_values(parameters):
+                update_optimization_history(strategy_name, metrics, parameters, received_at)
+                
+                # Generate optimization suggestions
+                generate_optimization_suggestions(strategy_name, received_at)
+            else:
+                # Generate a sample Pine Script for testing if no metrics/parameters
+                generate_sample_pine_script(strategy_name, received_at)
+    
+    except Exception as e:
+        print(f"Error processing webhook data: {str(e)}")
+        logger.exception(str(e))
+
+def has_values(fields):
+    """Return True if a decoded Metrics or Parameters struct has at least one field set"""
+    return fields is not None and any(value is not None for value in msgspec.structs.astuple(fields))
+
+def coerce_values(source, out):
+    """Copy the fields of a decoded struct into out as floats, defaulting missing or invalid values to 0"""
+    # All fields are read in one call, in declaration order (METRIC_KEYS/PARAM_KEYS order)
+    for key, value in zip(source.__struct_fields__, msgspec.structs.astuple(source)):
+        # Numbers are already decoded as floats; handle the other formats TradingView may send
+        if type(value) is not float:
+            if type(value) is WrappedValue:
+                value = value.value
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                value = 0.0
+        out[key] = value
+
+def update_optimization_history(strategy_name, metrics, parameters, timestamp):
     """Update the optimization history CSV file with new data"""
-    history_file = f"tradingview_data/{strategy_name}_optimization_history.csv"
+    history_file = history_path(strategy_name)
     
     # Create a row with timestamp, metrics, and parameters
     row = {
-        'timestamp': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'timestamp': timestamp,
     }
     
-    # Add metrics with proper error handling
-    for key in ['total_return_pct', 'win_rate', 'profit_factor', 'max_drawdown_pct', 'total_trades']:
-        if key in metrics:
-            # Handle different formats from TradingView
-            if isinstance(metrics[key], dict) and 'value' in metrics[key]:
-                row[key] = float(metrics[key]['value'])
-            elif isinstance(metrics[key], (int, float)):
-                row[key] = float(metrics[key])
-            else:
-                try:
-                    row[key] = float(metrics[key])
-                except (ValueError, TypeError):
-                    row[key] = 0
-        else:
-            row[key] = 0
+    # Add metrics and parameters with proper error handling
+    coerce_values(metrics, row)
+    coerce_values(parameters, row)
     
-    # Add parameters with proper error handling
-    for key in ['take_profit', 'stop_loss', 'trailing_stop', 'trailing_activation']:
-        if key in parameters:
-            # Handle different formats from TradingView
-            if isinstance(parameters[key], dict) and 'value' in parameters[key]:
-                row[key] = float(parameters[key]['value'])
-            elif isinstance(parameters[key], (int, float)):
-                row[key] = float(parameters[key])
-            else:
-                try:
-                    row[key] = float(parameters[key])
-                except (ValueError, TypeError):
-                    row[key] = 0
+    # Append the row, plus the header for a new or empty file, in one unbuffered write. Other server
+    # workers append to the same file, so an exclusive lock is held from the size check until the file
+    # is closed; seeking to the end gives the size without a stat call.
+    with open(history_file, 'a+b', buffering=0) as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        history_size = f.seek(0, os.SEEK_END)
+        # Drop a partial row left by an interrupted append, so the new row isn't glued onto it
+        if history_size > 0 and os.pread(f.fileno(), 1, history_size - 1) != b'\n':
+            history_size = truncate_partial_row(f, history_size)
+        data = format_csv_row([row[key] for key in FIELDS])
+        if history_size == 0:
+            data = format_csv_row(FIELDS) + data
+        data = data.encode()
+        f.write(data)
+        
+        # Fold the row into the running state if the state covered the history right up to this row;
+        # otherwise (first use in this worker after a restart) rebuild it from the file. The state is
+        # saved before the lock is released, so the next appender always finds it up to date.
+        state = new_strategy_state() if history_size == 0 else load_strategy_state(strategy_name, history_size)
+        if state is not None:
+            update_running_best(state, row)
+            state['history_size'] = history_size + len(data)
         else:
-            row[key] = 0
-    
-    # Convert to DataFrame
-    df_new = pd.DataFrame([row])
-    
-    # Append to existing file or create new one
-    if os.path.exists(history_file):
-        df_existing = pd.read_csv(history_file)
-        df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-        df_combined.to_csv(history_file, index=False)
-    else:
-        df_new.to_csv(history_file, index=False)
+            state = scan_history(f)
+        save_strategy_state(strategy_name, state)
     
     print(f"Updated optimization history for {strategy_name}")
 
-def generate_optimization_suggestions(strategy_name):
+def truncate_partial_row(f, size):
+    """Truncate a file to its last complete line, returning the new size"""
+    end = size
+    while end > 0:
+        start = max(end - 65536, 0)
+        newline = os.pread(f.fileno(), end - start, start).rfind(b'\n')
+        if newline >= 0:
+            size = start + newline + 1
+            break
+        end = start
+    else:
+        size = 0
+    f.truncate(size)
+    print(f"Removed a partial row from {f.name}")
+    return size
+
+def format_csv_row(values):
+    """Format one CSV line the way csv.writer writes it"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+def new_strategy_state():
+    return {'history_size': 0, 'count': 0, 'best_return': None, 'best_risk_adjusted': None,
+            'extents': {key: None for key in PLOT_EXTENT_KEYS}}
+
+def risk_adjusted_return(row):
+    """Return the risk-adjusted return of a history row (profit_factor * win_rate / max_drawdown_pct)"""
+    try:
+        # Add small value to avoid division by zero
+        return row['profit_factor'] * row['win_rate'] / (row['max_drawdown_pct'] + 0.1)
+    except ZeroDivisionError:
+        return float('nan')
+
+def update_running_best(state, row):
+    """Count a history row, widen the plotted extents and keep it as a best row if it beats the current one"""
+    state['count'] += 1
+    extents = state['extents']
+    for key, extent in extents.items():
+        value = row[key]
+        if not math.isfinite(value):
+            continue
+        if extent is None:
+            extents[key] = [value, value]
+        else:
+            extent[0] = min(extent[0], value)
+            extent[1] = max(extent[1], value)
+    for key, score in (('best_return', row['total_return_pct']), ('best_risk_adjusted', risk_adjusted_return(row))):
+        best = state[key]
+        # Ties keep the earlier row; NaN and infinite scores never win
+        if math.isfinite(score) and (best is None or score > best['score']):
+            state[key] = {'score': score, 'row': {k: row[k] for k in ANALYSED_KEYS}}
+
+def scan_history(f):
+    """Build the running state by scanning a whole open history CSV through a memory map; the caller
+    must hold a lock on the file so it can't be truncated while mapped"""
+    state = new_strategy_state()
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty files can't be mapped
+        return state
+    with mm:
+        # Ignore a trailing partial line from an append still in progress
+        end = mm.rfind(b'\n') + 1
+        state['history_size'] = end
+        header_end = mm.find(b'\n', 0, end)
+        if header_end < 0:
+            return state
+        header_line = mm[:header_end].rstrip(b'\r')
+        header = header_line.decode().split(',')
+        # Only the analysed columns are parsed; missing columns read as 0.0 like unparseable values
+        columns = [(key, header.index(key) if key in header else None) for key in ANALYSED_KEYS]
+        pos = header_end + 1
+        while pos < end:
+            line_end = mm.find(b'\n', pos, end)
+            line = mm[pos:line_end].rstrip(b'\r')
+            pos = line_end + 1
+            # Skip blank lines, and repeated headers written by racing appends before appends were locked
+            if not line or line == header_line:
+                continue
+            # Quoted fields may contain commas, so let the csv module split those lines
+            fields = next(csv.reader([line.decode()])) if b'"' in line else line.split(b',')
+            # Skip malformed rows, such as a torn row that a later append was glued onto
+            if len(fields) != len(header):
+                continue
+            row = {}
+            for key, index in columns:
+                try:
+                    row[key] = float(fields[index])
+                except (ValueError, TypeError):
+                    row[key] = 0.0
+            update_running_best(state, row)
+    return state
+
+def load_strategy_state(strategy_name, history_size):
+    """Return the running state if it covers exactly history_size bytes of the history, else None"""
+    state = _strategy_state.get(strategy_name)
+    if state is None or state['history_size'] != history_size:
+        # Another server worker may have saved a more recent state
+        try:
+            with open(strategy_state_path(strategy_name), 'rb') as f:
+                state = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            state = None
+        if state is not None and (state.get('history_size') != history_size or 'extents' not in state):
+            state = None
+    return state
+
+def save_strategy_state(strategy_name, state):
+    _strategy_state[strategy_name] = state
+    write_files([(strategy_state_path(strategy_name), orjson.dumps(state))])
+
+def generate_optimization_suggestions(strategy_name, timestamp):
     """Generate optimization suggestions based on historical performance"""
-    history_file = f"tradingview_data/{strategy_name}_optimization_history.csv"
+    history_file = history_path(strategy_name)
     
-    # Only generate suggestions if we have enough data
-    if not os.path.exists(history_file):
-        print(f"No history file found for {strategy_name}")
-        generate_sample_pine_script(strategy_name)
-        return
+    # Use the running state kept by update_optimization_history, loading or rebuilding it if needed
+    state = _strategy_state.get(strategy_name)
+    if state is None:
+        try:
+            history_size = os.path.getsize(history_file)
+        except FileNotFoundError:
+            print(f"No history file found for {strategy_name}")
+            generate_sample_pine_script(strategy_name, timestamp)
+            return
+        state = load_strategy_state(strategy_name, history_size)
+        if state is None:
+            with open(history_file, 'rb') as f:
+                # A shared lock keeps appenders from truncating the file while it is mapped,
+                # which would fault on pages past the new end
+                fcntl.flock(f, fcntl.LOCK_SH)
+                state = scan_history(f)
+        _strategy_state[strategy_name] = state
     
-    df = pd.read_csv(history_file)
-    if len(df) < 3:  # Need at least 3 data points
-        print(f"Not enough data points for {strategy_name} (need at least 3, have {len(df)})")
-        generate_sample_pine_script(strategy_name)
+    # Only generate suggestions if we have enough data
+    data_points = state['count']
+    if data_points < 3 or state['best_return'] is None or state['best_risk_adjusted'] is None:
+        print(f"Not enough data points for {strategy_name} (need at least 3, have {data_points})")
+        generate_sample_pine_script(strategy_name, timestamp)
         return
     
-    print(f"Generating optimization suggestions for {strategy_name} with {len(df)} data points")
+    print(f"Generating optimization suggestions for {strategy_name} with {data_points} data points")
     
-    # Find best performing parameters
-    best_return_idx = df['total_return_pct'].idxmax()
-    
-    # Calculate risk-adjusted return (profit_factor * win_rate / max_drawdown_pct)
-    # Add small value to avoid division by zero
-    df['risk_adjusted_return'] = df['profit_factor'] * df['win_rate'] / (df['max_drawdown_pct'] + 0.1)
-    best_risk_adjusted_idx = df['risk_adjusted_return'].idxmax()
-    
-    # Get parameters for best return
-    best_return_params = {
-        'take_profit': df.loc[best_return_idx, 'take_profit'],
-        'stop_loss': df.loc[best_return_idx, 'stop_loss'],
-        'trailing_stop': df.loc[best_return_idx, 'trailing_stop'],
-        'trailing_activation': df.loc[best_return_idx, 'trailing_activation']
-    }
-    
-    # Get parameters for best risk-adjusted return
-    best_risk_adjusted_params = {
-        'take_profit': df.loc[best_risk_adjusted_idx, 'take_profit'],
-        'stop_loss': df.loc[best_risk_adjusted_idx, 'stop_loss'],
-        'trailing_stop': df.loc[best_risk_adjusted_idx, 'trailing_stop'],
-        'trailing_activation': df.loc[best_risk_adjusted_idx, 'trailing_activation']
-    }
+    # Get parameters and metrics for best return and best risk-adjusted return
+    best_return = state['best_return']['row']
+    best_risk_adjusted = state['best_risk_adjusted']['row']
+    best_return_params = {key: best_return[key] for key in PARAM_KEYS}
+    best_return_metrics = {key: best_return[key] for key in SUMMARY_METRIC_KEYS}
+    best_risk_adjusted_params = {key: best_risk_adjusted[key] for key in PARAM_KEYS}
+    best_risk_adjusted_metrics = {key: best_risk_adjusted[key] for key in SUMMARY_METRIC_KEYS}
     
     # Create exploratory parameters (slightly modified from best)
     exploratory_params = best_return_params.copy()
     exploratory_params['take_profit'] = float(exploratory_params['take_profit']) * 1.1  # 10% higher
     exploratory_params['stop_loss'] = float(exploratory_params['stop_loss']) * 0.9  # 10% lower
     
-    # Generate Pine Script files with suggested parameters
-    generate_pine_script(strategy_name, "best_return", best_return_params)
-    generate_pine_script(strategy_name, "best_risk_adjusted", best_risk_adjusted_params)
-    generate_pine_script(strategy_name, "exploratory", exploratory_params)
-    
-    # Generate visualization if we have enough data points
-    if len(df) >= 5:
-        generate_visualization(strategy_name, df)
+    # Skip rewriting the suggestions if the suggested parameters haven't changed since the last run
+    suggestions = [("best_return", best_return_params),
+                   ("best_risk_adjusted", best_risk_adjusted_params),
+                   ("exploratory", exploratory_params)]
+    suggested_values = tuple(tuple(params.values()) for _, params in suggestions)
+    # The Pine Script path is hashed too, so files from an older output layout get rewritten
+    hashed = (pine_path(strategy_name), suggested_values)
+    suggestions_hash = hashlib.blake2b(repr(hashed).encode(), digest_size=16).hexdigest()
+    if suggestions_hash == get_suggestions_hash(strategy_name):
+        print(f"Suggested parameters unchanged for {strategy_name}, suggestions not rewritten")
+        submit_visualization(strategy_name, history_file, state)
+        return
     
     # Save summary of suggestions
     summary = {
         "strategy_name": strategy_name,
-        "data_points": len(df),
+        "data_points": data_points,
         "best_return": {
             "parameters": best_return_params,
-            "metrics": {
-                "total_return_pct": df.loc[best_return_idx, 'total_return_pct'],
-                "win_rate": df.loc[best_return_idx, 'win_rate'],
-                "profit_factor": df.loc[best_return_idx, 'profit_factor'],
-                "max_drawdown_pct": df.loc[best_return_idx, 'max_drawdown_pct']
-            }
+            "metrics": best_return_metrics
         },
         "best_risk_adjusted": {
             "parameters": best_risk_adjusted_params,
-            "metrics": {
-                "total_return_pct": df.loc[best_risk_adjusted_idx, 'total_return_pct'],
-                "win_rate": df.loc[best_risk_adjusted_idx, 'win_rate'],
-                "profit_factor": df.loc[best_risk_adjusted_idx, 'profit_factor'],
-                "max_drawdown_pct": df.loc[best_risk_adjusted_idx, 'max_drawdown_pct']
-            }
+            "metrics": best_risk_adjusted_metrics
         },
         "exploratory_suggestion": {
             "parameters": exploratory_params
         },
-        "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        "generated_at": timestamp
     }
+    output_files = [(suggestions_path(strategy_name), orjson.dumps(summary, option=orjson.OPT_INDENT_2))]
+    
+    # Generate one Pine Script file holding a script per suggestion
+    output_files.append(render_pine_scripts(strategy_name, suggestions, timestamp))
+    
+    # Record the hash last, so an interrupted write is redone on the next webhook
+    output_files.append((suggestions_hash_path(strategy_name), suggestions_hash.encode()))
+    write_files(output_files)
     
-    with open(f"optimization_results/{strategy_name}_suggestions.json", 'w') as f:
-        json.dump(summary, f, indent=4)
+    # Remove per-suggestion scripts from the old layout, so nothing reads their stale parameters;
+    # this is a one-time migration, done once per strategy in each server worker
+    if strategy_name not in _legacy_pine_removed:
+        _legacy_pine_removed.add(strategy_name)
+        for suggestion_type, _ in suggestions:
+            try:
+                os.unlink(legacy_pine_path(strategy_name, suggestion_type))
+            except FileNotFoundError:
+                pass
     
+    print(f"Generated Pine Scripts for {strategy_name} ({', '.join(name for name, _ in suggestions)})")
     print(f"Generated optimization suggestions for {strategy_name}")
+    
+    # Plots are only submitted once the suggestions are saved, so a plotting failure can't lose them
+    submit_visualization(strategy_name, history_file, state)
 
-def generate_sample_pine_script(strategy_name):
-    """Generate a simple Pine Script file for testing"""
-    pine_script = f"""// TradingView Pine Script Template
-// Sample script for {strategy_name}
-// Generated on {datetime.datetime.now().strftime("%Y-%m-%d")}
+def submit_visualization(strategy_name, history_file, state):
+    """Render the plots in the plotting process if there are enough data points, the plots would
+    change and the cooldown has passed"""
+    global _plot_executor
+    data_points = state['count']
+    if data_points < 5 or _plot_executor is None or not visualization_outdated(strategy_name, state):
+        return
+    now = time.monotonic()
+    if now - _last_plot_ts.get(strategy_name, float('-inf')) < PLOT_COOLDOWN_SECONDS:
+        return
+    _last_plot_ts[strategy_name] = now
+    _viz_state[strategy_name] = (data_points, plot_extents(state))
+    try:
+        _plot_executor.submit(generate_visualization, strategy_name, history_file)
+    except concurrent.futures.process.BrokenProcessPool as e:
+        # The plotting process died (e.g. killed for memory); start a new one for the next render
+        print(f"Visualization error: {str(e)}")
+        logger.exception(f"Visualization error: {str(e)}")
+        _plot_executor.shutdown(wait=False)
+        _plot_executor = new_plot_executor()
+
+def visualization_outdated(strategy_name, state):
+    """Return True if enough rows were added or the parameter extents changed since the last render"""
+    last = _viz_state.get(strategy_name)
+    if last is None:
+        return True
+    last_count, last_extents = last
+    return state['count'] - last_count >= PLOT_EVERY_ROWS or plot_extents(state) != last_extents
+
+def plot_extents(state):
+    return tuple(tuple(extent) if extent else None for extent in state['extents'].values())
+
+def get_suggestions_hash(strategy_name):
+    """Return the hash of the last written suggestions from the sidecar file, or None"""
+    # Always read the file: another server worker may have rewritten the suggestions since
+    try:
+        with open(suggestions_hash_path(strategy_name)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+# Pine Script templates, built once at import and filled with %-formatting; the date comes from the
+# per-second timestamp cache so rendering does no strftime work
+_PINE_SAMPLE_TEMPLATE = """// TradingView Pine Script Template
+// Sample script for %(strategy_name)s
+// Generated on %(date)s
 
 //@version=5
-strategy("{strategy_name} - Sample", overlay=true)
+strategy("%(strategy_name)s - Sample", overlay=true)
 
 // Input parameters
 takeProfit = 5.0
@@ -249,29 +724,22 @@ if (longCondition)
 // Example exit with parameters
 strategy.exit("TP/SL", "Long", profit=takeProfit, loss=stopLoss, trail_points=trailingStop, trail_offset=trailingActivation)
 """
-    
-    # Save the script to the optimization_results directory
-    output_file = f"optimization_results/{strategy_name}_sample.pine"
-    with open(output_file, 'w') as f:
-        f.write(pine_script)
-    
-    print(f"Generated sample Pine Script for {strategy_name}")
 
-def generate_pine_script(strategy_name, suggestion_type, parameters):
-    """Generate a Pine Script file with suggested parameters"""
-    # Use a string template instead of trying to read a file
-    pine_script_template = """// TradingView Pine Script Template
-// Optimized parameters for {strategy_name} - {suggestion_type}
-// Generated on {date}
+# Line preceding each script in the combined suggestions file, for tools that split it
+PINE_SUGGESTION_DELIMITER = "// ==== SUGGESTION: %s ===="
+
+_PINE_TEMPLATE = """// TradingView Pine Script Template
+// Optimized parameters for %(strategy_name)s - %(suggestion_type)s
+// Generated on %(date)s
 
 //@version=5
-strategy("{strategy_name} - {suggestion_type}", overlay=true)
+strategy("%(strategy_name)s - %(suggestion_type)s", overlay=true)
 
 // Input parameters
-takeProfit = {take_profit} // Optimized
-stopLoss = {stop_loss} // Optimized
-trailingStopPct = {trailing_stop} // Optimized
-trailingActivationThreshold = {trailing_activation} // Optimized
+takeProfit = %(take_profit)s // Optimized
+stopLoss = %(stop_loss)s // Optimized
+trailingStopPct = %(trailing_stop)s // Optimized
+trailingActivationThreshold = %(trailing_activation)s // Optimized
 
 // Your strategy logic goes here
 // This is a placeholder template
@@ -284,100 +752,181 @@ if (longCondition)
 // Example exit with optimized parameters
 strategy.exit("TP/SL", "Long", profit=takeProfit, loss=stopLoss, trail_points=trailingStopPct, trail_offset=trailingActivationThreshold)
 """
+
+def generate_sample_pine_script(strategy_name, timestamp):
+    """Generate a simple Pine Script file for testing"""
+    pine_script = _PINE_SAMPLE_TEMPLATE % {
+        'strategy_name': strategy_name,
+        'date': timestamp[:10]
+    }
+    
+    # Save the script to the optimization_results directory
+    output_file = sample_pine_path(strategy_name)
+    write_files([(output_file, pine_script.encode())])
+    
+    print(f"Generated sample Pine Script for {strategy_name}")
+
+def render_pine_scripts(strategy_name, suggestions, timestamp):
+    """Render the Pine Script for each (suggestion type, parameters) pair into one file, returning (output path, file bytes)"""
+    blocks = []
+    for suggestion_type, params in suggestions:
+        blocks.append(PINE_SUGGESTION_DELIMITER % suggestion_type + '\n'
+                      + render_pine_script(strategy_name, suggestion_type, params, timestamp))
     
+    # The file is saved to the optimization_results directory by the caller
+    return pine_path(strategy_name), '\n'.join(blocks).encode()
+
+def render_pine_script(strategy_name, suggestion_type, parameters, timestamp):
+    """Render a Pine Script with suggested parameters"""
     # Format the template with parameters
-    formatted_script = pine_script_template.format(
-        strategy_name=strategy_name,
-        suggestion_type=suggestion_type,
-        date=datetime.datetime.now().strftime("%Y-%m-%d"),
-        take_profit=parameters.get('take_profit', 5.0),
-        stop_loss=parameters.get('stop_loss', 3.0),
-        trailing_stop=parameters.get('trailing_stop', 1.0),
-        trailing_activation=parameters.get('trailing_activation', 0.5)
-    )
+    formatted_script = _PINE_TEMPLATE % {
+        'strategy_name': strategy_name,
+        'suggestion_type': suggestion_type,
+        'date': timestamp[:10],
+        'take_profit': parameters.get('take_profit', 5.0),
+        'stop_loss': parameters.get('stop_loss', 3.0),
+        'trailing_stop': parameters.get('trailing_stop', 1.0),
+        'trailing_activation': parameters.get('trailing_activation', 0.5)
+    }
     
-    # Save the new script to the optimization_results directory
-    os.makedirs('optimization_results', exist_ok=True)
-    output_file = f"optimization_results/{strategy_name}_{suggestion_type}_suggested.pine"
-    with open(output_file, 'w') as f:
-        f.write(formatted_script)
+    return formatted_script
+
+def write_files(files):
+    """Atomically write (path, bytes) pairs using raw file descriptors, without Python file-object buffering"""
+    for path, data in files:
+        # Write a temporary file named per process, so server workers never share one, and swap it
+        # into place: readers and a crash mid-write only ever see the old or the new file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+def _get_plot_figures():
+    """Return the figures reused for plotting, creating them on first use in the plotting process"""
+    if not _PLOT_FIGS:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg  # Headless Agg canvas, no pyplot/GUI state
+        fig = Figure(figsize=(15, 12))
+        heatmap_fig = Figure(figsize=(10, 8))
+        _PLOT_FIGS.update(fig=fig, axs=fig.subplots(2, 2), canvas=FigureCanvasAgg(fig),
+                          heatmap_fig=heatmap_fig, heatmap_ax=heatmap_fig.subplots(),
+                          heatmap_canvas=FigureCanvasAgg(heatmap_fig))
+    return _PLOT_FIGS
+
+def _draw_colorbar(fig, mappable, ax, key, label):
+    """Draw a colorbar, reusing the colorbar axes from a previous render if there is one"""
+    if key in _PLOT_FIGS:
+        cax = _PLOT_FIGS[key]
+        cax.cla()
+        fig.colorbar(mappable, cax=cax, label=label)
+    else:
+        _PLOT_FIGS[key] = fig.colorbar(mappable, ax=ax, label=label).ax
+
+def save_png(canvas, path):
+    """Render a canvas to PNG in memory and write it atomically"""
+    buffer = io.BytesIO()
+    canvas.print_png(buffer)
+    write_files([(path, buffer.getbuffer())])
+
+def render_visualization(strategy_name, df):
+    """Draw the parameter analysis and correlation heatmap onto the reused figures and save them"""
+    import numpy as np
     
-    print(f"Generated Pine Script for {strategy_name} ({suggestion_type})")
+    # Reuse the figure with multiple subplots from previous renders
+    figs = _get_plot_figures()
+    fig, axs = figs['fig'], figs['axs']
+    for ax in axs.flat:
+        ax.cla()
+    fig.suptitle(f'{strategy_name} - Parameter Impact Analysis', fontsize=16)
+
+    # Plot 1: Take Profit vs Total Return
+    axs[0, 0].scatter(df['take_profit'], df['total_return_pct'], alpha=0.7)
+    axs[0, 0].set_title('Take Profit vs Total Return')
+    axs[0, 0].set_xlabel('Take Profit')
+    axs[0, 0].set_ylabel('Total Return %')
+    axs[0, 0].grid(True, alpha=0.3)
+
+    # Plot 2: Stop Loss vs Total Return
+    axs[0, 1].scatter(df['stop_loss'], df['total_return_pct'], alpha=0.7)
+    axs[0, 1].set_title('Stop Loss vs Total Return')
+    axs[0, 1].set_xlabel('Stop Loss')
+    axs[0, 1].set_ylabel('Total Return %')
+    axs[0, 1].grid(True, alpha=0.3)
+
+    # Plot 3: Trailing Stop vs Total Return
+    axs[1, 0].scatter(df['trailing_stop'], df['total_return_pct'], alpha=0.7)
+    axs[1, 0].set_title('Trailing Stop vs Total Return')
+    axs[1, 0].set_xlabel('Trailing Stop')
+    axs[1, 0].set_ylabel('Total Return %')
+    axs[1, 0].grid(True, alpha=0.3)
+
+    # Plot 4: Win Rate vs Profit Factor
+    scatter = axs[1, 1].scatter(df['win_rate'], df['profit_factor'], 
+                      c=df['total_return_pct'], cmap='viridis', 
+                      alpha=0.7, s=100)
+    axs[1, 1].set_title('Win Rate vs Profit Factor (color = Total Return)')
+    axs[1, 1].set_xlabel('Win Rate')
+    axs[1, 1].set_ylabel('Profit Factor')
+    axs[1, 1].grid(True, alpha=0.3)
+    _draw_colorbar(fig, scatter, axs[1, 1], 'scatter_cax', 'Total Return %')
+
+    # Adjust layout and save
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    save_png(figs['canvas'], f"optimization_results/{strategy_name}_parameter_analysis.png")
+
+    # Create a correlation heatmap
+    heatmap_fig, heatmap_ax = figs['heatmap_fig'], figs['heatmap_ax']
+    heatmap_ax.cla()
+    corr_columns = ['take_profit', 'stop_loss', 'trailing_stop', 'trailing_activation', 
+                    'total_return_pct', 'win_rate', 'profit_factor', 'max_drawdown_pct']
+    # Constant columns have no defined correlation and come out as NaN, as with DataFrame.corr()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr_values = np.corrcoef(df[corr_columns].to_numpy(dtype=np.float64, copy=False), rowvar=False)
+    image = heatmap_ax.imshow(corr_values, cmap='coolwarm', interpolation='none', aspect='auto')
+    _draw_colorbar(heatmap_fig, image, heatmap_ax, 'heatmap_cax', 'Correlation Coefficient')
+    heatmap_ax.set_title(f'{strategy_name} - Parameter Correlation Analysis', fontsize=14)
+    heatmap_ax.set_xticks(range(len(corr_columns)))
+    heatmap_ax.set_xticklabels(corr_columns, rotation=45, ha='right')
+    heatmap_ax.set_yticks(range(len(corr_columns)))
+    heatmap_ax.set_yticklabels(corr_columns)
+
+    # Add correlation values, with labels and colors computed for the whole matrix at once
+    labels = np.char.mod('%.2f', corr_values)
+    colors = np.where(np.abs(corr_values) > 0.5, 'white', 'black')
+    for (i, j), label in np.ndenumerate(labels):
+        heatmap_ax.text(j, i, label, ha='center', va='center', color=colors[i, j])
+
+    heatmap_fig.tight_layout()
+    save_png(figs['heatmap_canvas'], f"optimization_results/{strategy_name}_correlation_analysis.png")
 
-def generate_visualization(strategy_name, df):
+def generate_visualization(strategy_name, history_file):
     """Generate visualization of parameter impact on performance"""
     try:
-        # Create output directory if it doesn't exist
-        os.makedirs('optimization_results', exist_ok=True)
-        
-        # Create a figure with multiple subplots
-        fig, axs = plt.subplots(2, 2, figsize=(15, 12))
-        fig.suptitle(f'{strategy_name} - Parameter Impact Analysis', fontsize=16)
-        
-        # Plot 1: Take Profit vs Total Return
-        axs[0, 0].scatter(df['take_profit'], df['total_return_pct'], alpha=0.7)
-        axs[0, 0].set_title('Take Profit vs Total Return')
-        axs[0, 0].set_xlabel('Take Profit')
-        axs[0, 0].set_ylabel('Total Return %')
-        axs[0, 0].grid(True, alpha=0.3)
-        
-        # Plot 2: Stop Loss vs Total Return
-        axs[0, 1].scatter(df['stop_loss'], df['total_return_pct'], alpha=0.7)
-        axs[0, 1].set_title('Stop Loss vs Total Return')
-        axs[0, 1].set_xlabel('Stop Loss')
-        axs[0, 1].set_ylabel('Total Return %')
-        axs[0, 1].grid(True, alpha=0.3)
-        
-        # Plot 3: Trailing Stop vs Total Return
-        axs[1, 0].scatter(df['trailing_stop'], df['total_return_pct'], alpha=0.7)
-        axs[1, 0].set_title('Trailing Stop vs Total Return')
-        axs[1, 0].set_xlabel('Trailing Stop')
-        axs[1, 0].set_ylabel('Total Return %')
-        axs[1, 0].grid(True, alpha=0.3)
-        
-        # Plot 4: Win Rate vs Profit Factor
-        scatter = axs[1, 1].scatter(df['win_rate'], df['profit_factor'], 
-                          c=df['total_return_pct'], cmap='viridis', 
-                          alpha=0.7, s=100)
-        axs[1, 1].set_title('Win Rate vs Profit Factor (color = Total Return)')
-        axs[1, 1].set_xlabel('Win Rate')
-        axs[1, 1].set_ylabel('Profit Factor')
-        axs[1, 1].grid(True, alpha=0.3)
-        fig.colorbar(scatter, ax=axs[1, 1], label='Total Return %')
-        
-        # Adjust layout and save
-        plt.tight_layout(rect=[0, 0, 1, 0.96])
-        plt.savefig(f"optimization_results/{strategy_name}_parameter_analysis.png")
-        
-        # Create a correlation heatmap
-        plt.figure(figsize=(10, 8))
-        corr_columns = ['take_profit', 'stop_loss', 'trailing_stop', 'trailing_activation', 
-                        'total_return_pct', 'win_rate', 'profit_factor', 'max_drawdown_pct']
-        corr_df = df[corr_columns].corr()
-        plt.imshow(corr_df, cmap='coolwarm', interpolation='none', aspect='auto')
-        plt.colorbar(label='Correlation Coefficient')
-        plt.title(f'{strategy_name} - Parameter Correlation Analysis', fontsize=14)
-        plt.xticks(range(len(corr_columns)), corr_columns, rotation=45, ha='right')
-        plt.yticks(range(len(corr_columns)), corr_columns)
-        
-        # Add correlation values
-        for i in range(len(corr_columns)):
-            for j in range(len(corr_columns)):
-                plt.text(j, i, f'{corr_df.iloc[i, j]:.2f}', 
-                        ha='center', va='center', 
-                        color='white' if abs(corr_df.iloc[i, j]) > 0.5 else 'black')
+        import pandas as pd
+        df = pd.read_csv(history_file)
         
-        plt.tight_layout()
-        plt.savefig(f"optimization_results/{strategy_name}_correlation_analysis.png")
+        with _plot_lock:
+            render_visualization(strategy_name, df)
         
         print(f"Generated visualization for {strategy_name}")
         
     except Exception as e:
         # Log visualization errors but don't fail
         print(f"Visualization error: {str(e)}")
-        with open('tradingview_data/error_log.txt', 'a') as f:
-            f.write(f"{datetime.datetime.now()}: Visualization error: {str(e)}\n")
+        logger.exception(f"Visualization error: {str(e)}")
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+    # uvloop and httptools are picked automatically when installed
+    uvicorn.run('webhook_receiver:app', host='0.0.0.0', port=port, workers=workers,
+                loop='auto', http='auto', access_log=False)